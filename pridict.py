@@ -1,20 +1,56 @@
 import os
+import atexit
+import logging
 import telebot
 import random
 import time
-import pytz
 import socket
-from datetime import datetime, timedelta
+import fcntl
+import uuid
+import hmac
+import queue
+import heapq
+import redis
+import ujson
+import requests
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener
+from datetime import datetime, timedelta, timezone
 from threading import Thread, Lock
-from flask import Flask
+from telebot import apihelper
+from telebot.apihelper import ApiTelegramException
+from requests.adapters import HTTPAdapter
+from flask import Flask, request, abort
+from flask.json.provider import DefaultJSONProvider
+from cachetools import TTLCache
+from waitress import serve
 
 # ================= CONFIGURATION =================
 BOT_TOKEN = os.environ.get('BOT_TOKEN')
 CHANNEL_USERNAME = os.environ.get('CHANNEL_USERNAME', 'testsub01')
+REDIS_URL = os.environ.get('REDIS_URL')
 COOLDOWN_SECONDS = 120
+MAX_PREDICTIONS = 1  # per COOLDOWN_SECONDS window
 PREDICTION_DELAY = 130
+PREDICTION_BATCH = 4096
 PORT = int(os.environ.get('PORT', 10000))
-INDIAN_TIMEZONE = pytz.timezone('Asia/Kolkata')
+WEBHOOK_URL = os.environ.get('RENDER_EXTERNAL_URL')
+POLLING_LOCK_PATH = '/tmp/bot.lock'
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+WEB_THREADS = int(os.environ.get('WEB_THREADS', 16))
+BOT_THREADS = 16  # telebot handler workers; handlers block on Telegram I/O
+GLOBAL_SEND_LIMIT = 25  # messages per second across all chats (Telegram allows 30)
+CHAT_SEND_LIMIT = 1  # messages per second to a single chat
+SEND_WORKERS = 8  # concurrent outbound calls; each waits a full round trip
+# chat_member updates evict leavers early; that relies on never dropping the
+# updates queued while the bot was down
+MEMBER_CACHE_TTL = 3600
+NON_MEMBER_CACHE_TTL = 30
+LOCAL_MEMBER_CACHE_TTL = 30  # in-process layer in front of Redis
+SEEN_USER_TTL = 30 * 86400  # idle users get the welcome sticker again after this
+MEMBER_STATUSES = ("member", "administrator", "creator")
+ALLOWED_UPDATES = ["message", "callback_query", "chat_member"]
+INDIAN_TIMEZONE = timezone(timedelta(hours=5, minutes=30), 'IST')  # no DST
 
 # Emojis and Stickers
 ROCKET = "🚀"
@@ -29,40 +65,348 @@ GRAPH = "📈"
 SHIELD = "🛡️"
 ROCKET_STICKER_ID = "CAACAgUAAxkBAAEL3xRmEeX3xQABHYYYr4YH1LQhUe3VdW8AAp4LAAIWjvlVjXjWbJQN0k80BA"  # Replace with actual sticker ID
 
-# Track first-time users
-first_time_users = set()
+if not BOT_TOKEN:
+    raise SystemExit("BOT_TOKEN env var required")
+if not CHANNEL_USERNAME:
+    raise SystemExit("CHANNEL_USERNAME env var required")
+if not REDIS_URL:
+    raise SystemExit("REDIS_URL env var required")
+
+# Sliding-window limiter: trims the user's window, counts it and records the
+# request atomically, marking the user as seen on the same round trip. Each
+# user's seen marker is its own key that lapses after SEEN_USER_TTL idle, so
+# the seen users don't pile up in Redis forever.
+# Returns {count_before, seconds_until_a_slot_frees, first_time}.
+# Uses the Redis server clock so every process agrees on the window.
+COOLDOWN_SCRIPT = """
+redis.replicate_commands()
+local key, active, seen = KEYS[1], KEYS[2], KEYS[3]
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local window, limit = tonumber(ARGV[1]), tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+redis.call('ZREMRANGEBYSCORE', active, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+if count < limit then
+    redis.call('ZADD', key, now, ARGV[3])
+    redis.call('EXPIRE', key, window)
+    redis.call('ZADD', active, now, ARGV[4])
+    local first = redis.call('SET', seen, 1, 'NX', 'EX', ARGV[5])
+    if not first then
+        redis.call('EXPIRE', seen, ARGV[5])
+    end
+    return {count, 0, first and 1 or 0}
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return {count, math.ceil(tonumber(oldest[2]) + window - now), 0}
+"""
+ACTIVE_COOLDOWNS_KEY = "cooldowns:active"
+
+# ================ LOGGING ================
+# Records are handed to a listener thread so handlers never block on stdout
+log_queue = queue.SimpleQueue()
+log_handler = logging.StreamHandler()
+log_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+log_listener = QueueListener(log_queue, log_handler)
+log_listener.start()
+atexit.register(log_listener.stop)  # flush queued records on shutdown
+# The listener's handler does the formatting; keep basicConfig's default
+# format off the queued message so lines aren't prefixed twice
+queue_handler = QueueHandler(log_queue)
+queue_handler.setFormatter(logging.Formatter('%(message)s'))
+logging.basicConfig(level=LOG_LEVEL, handlers=[queue_handler])
+# telebot attaches its own stream handler; don't log its records twice
+logging.getLogger('TeleBot').propagate = False
+log = logging.getLogger(__name__)
 
 # ================ UTILITY FUNCTIONS ================
-def is_port_in_use(port):
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        return s.connect_ex(('localhost', port)) == 0
+def bind_socket(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    # Lets several worker processes share the port with kernel load balancing
+    if hasattr(socket, 'SO_REUSEPORT'):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(('0.0.0.0', port))
+    return sock
 
 def get_indian_time():
     return datetime.now(INDIAN_TIMEZONE)
 
 def format_time(dt):
-    return dt.strftime("%H:%M")
+    return f"{dt.hour:02d}:{dt.minute:02d}"
+
+# Members stay cached until a chat_member update says otherwise; the short
+# negative TTL keeps users who just joined from being locked out for long.
+# Kept in Redis so every replica shares the lookups and the invalidations,
+# with a short-lived local copy so members' repeat clicks skip the Redis
+# round trip. Only members are kept locally: a join verified on another
+# replica only reaches Redis, so a cached "no" here would hide it.
+def cache_membership(user_id, status):
+    with local_member_cache_lock:
+        if status:
+            local_member_cache[user_id] = True
+        else:
+            local_member_cache.pop(user_id, None)
+    try:
+        redis_client.set(
+            f"member:{user_id}",
+            "1" if status else "0",
+            ex=MEMBER_CACHE_TTL if status else NON_MEMBER_CACHE_TTL
+        )
+    except redis.RedisError as e:
+        log.warning("Membership cache error: %s", e)
 
-def is_member(user_id):
+def is_member(user_id, refresh=False):
+    if not refresh:
+        with local_member_cache_lock:
+            cached_member = user_id in local_member_cache
+        if cached_member:
+            return True
+        try:
+            cached = redis_client.get(f"member:{user_id}")
+        except redis.RedisError as e:
+            log.warning("Membership cache error: %s", e)
+            cached = None
+        if cached is not None:
+            status = cached == b"1"
+            if status:
+                with local_member_cache_lock:
+                    local_member_cache[user_id] = True
+            return status
     try:
         member = bot.get_chat_member(f"@{CHANNEL_USERNAME}", user_id)
-        return member.status in ["member", "administrator", "creator"]
+        status = member.status in MEMBER_STATUSES
     except Exception as e:
-        print(f"Membership error: {e}")
+        log.warning("Membership error: %s", e)
         return False
+    cache_membership(user_id, status)
+    return status
 
 # ============== BOT INITIALIZATION ==============
-bot = telebot.TeleBot(BOT_TOKEN)
+# One pooled keep-alive session for every API call instead of one per thread
+api_session = requests.Session()
+api_session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=0))
+apihelper.session = api_session
+apihelper.CONNECT_TIMEOUT = 3
+apihelper.READ_TIMEOUT = 10
+
+bot = telebot.TeleBot(BOT_TOKEN, parse_mode="HTML", num_threads=BOT_THREADS)
 app = Flask(__name__)
-bot_lock = Lock()
-cooldowns = {}
+redis_client = redis.Redis(
+    connection_pool=redis.BlockingConnectionPool.from_url(
+        REDIS_URL, max_connections=50, timeout=5
+    )
+)
+local_member_cache = TTLCache(maxsize=10_000, ttl=LOCAL_MEMBER_CACHE_TTL)
+local_member_cache_lock = Lock()
+# Sent once, then invoked by SHA with EVALSHA
+cooldown_script = redis_client.register_script(COOLDOWN_SCRIPT)
+
+# ============== MESSAGES ==============
+WELCOME_MSG = (
+    f"{GRAPH} <b>ᗯEᒪᑕOᗰE TO ᗩI-ᑭOᗯEᖇEᗪ ᑭᖇEᗪIᑕTIOᑎ ᗷOT</b> {GRAPH}\n\n"
+    
+    "This bot generates high-probability predictions using "
+    "advanced algorithms. For optimal results:\n"
+    
+    f"{DIAMOND} Use suggested assurance for risk management\n"
+    f"{DIAMOND} Follow cooldown periods between predictions\n\n"
+    f"{SHIELD} <b>VIP Channel:</b> @{CHANNEL_USERNAME}"
+)
+
+JOIN_MSG = (
+    f"{CROSS} <b>🅿🆁🅴🅼🅸🆄🅼 🅰🅲🅲🅴🆂🆂 🆁🅴🆀🆄🅸🆁🅴🅳</b>\n\n"
+    "\n You must join our VIP channel to access predictions:\n"
+    f"👉 @{CHANNEL_USERNAME}\n\n"
+    "After joining, click 'Verify Membership'"
+)
+
+# Only the time, coefficient and assurance change between predictions
+PREDICTION_TEMPLATE = (
+    f"{ROCKET} <b>LUCKY JET PREDICTION</b>\n"
+    "┏━━━━━━━━━━━━━\n"
+    f"┠ {DIAMOND} 🕒 𝐓𝐈𝐌𝐄 : {{t}}\n"
+    f"┠\n"
+    f"┠ {DIAMOND} 𝐂𝐎𝐄𝐅𝐅𝐈𝐂𝐈𝐄𝐍𝐓 : {{p}}X {ROCKET}\n"
+    f"┠\n"
+    f"┠ {DIAMOND} 𝐀𝐒𝐒𝐔𝐑𝐄𝐍𝐂𝐄 : {{s}}X\n"
+    "┗━━━━━━━━━━━━━\n\n"
+    f"{HOURGLASS} Next prediction available in {COOLDOWN_SECONDS//60} minutes"
+)
+format_prediction = PREDICTION_TEMPLATE.format
+
+# ============== KEYBOARDS ==============
+WELCOME_MARKUP = telebot.types.InlineKeyboardMarkup()
+WELCOME_MARKUP.add(
+    telebot.types.InlineKeyboardButton(
+        f"{ROCKET} Generate Prediction {ROCKET}", 
+        callback_data="get_prediction"
+    )
+)
+
+JOIN_MARKUP = telebot.types.InlineKeyboardMarkup()
+JOIN_MARKUP.add(
+    telebot.types.InlineKeyboardButton(
+        "Join VIP Channel", 
+        url=f"https://t.me/{CHANNEL_USERNAME}"
+    ),
+    telebot.types.InlineKeyboardButton(
+        "Verify Membership", 
+        callback_data="check_membership"
+    )
+)
+
+PREDICTION_MARKUP = telebot.types.InlineKeyboardMarkup()
+PREDICTION_MARKUP.add(
+    telebot.types.InlineKeyboardButton(
+        f"{ROCKET} New Prediction {ROCKET}", 
+        callback_data="get_prediction"
+    )
+)
+
+# ============== OUTBOUND QUEUE ==============
+# Handlers enqueue outbound API calls; a single sender thread paces them to
+# stay under Telegram's global and per-chat limits instead of tripping 429s.
+send_queue = queue.Queue()
+
+def queue_call(chat_id, method, /, *args, **kwargs):
+    send_queue.put((chat_id, method, args, kwargs))
+
+def queue_message(chat_id, text, **kwargs):
+    queue_call(chat_id, bot.send_message, chat_id, text, **kwargs)
+
+def wait_for_slot(sends, limit):
+    while True:
+        now = time.monotonic()
+        while sends and now - sends[0] >= 1:
+            sends.popleft()
+        if len(sends) < limit:
+            return
+        time.sleep(1 - (now - sends[0]))
+
+def send_call(method, args, kwargs):
+    while True:
+        try:
+            method(*args, **kwargs)
+            return
+        except ApiTelegramException as e:
+            if e.error_code != 429:
+                log.warning("%s error: %s", method.__name__, e)
+                return
+            retry_after = e.result_json.get("parameters", {}).get("retry_after", 1)
+            log.warning("Rate limited, retrying in %ss", retry_after)
+            time.sleep(retry_after)
+        except Exception:
+            log.exception("%s error", method.__name__)
+            return
+
+def run_send_worker(shard):
+    while True:
+        send_call(*shard.get())
+
+# A chat waiting out its own limit must not hold up the others, so calls are
+# parked per chat and a heap tracks when each chat may be sent to next. This
+# loop only paces and only sleeps for the global limit; the API calls run on
+# SEND_WORKERS threads, sharded by chat so each chat's calls stay in order.
+# A 429 retry_after stalls just the worker that hit it; those retries are not
+# recounted, which the headroom under Telegram's 30/s covers.
+def run_sender():
+    global_sends = deque()
+    pending = {}  # chat_id -> calls waiting for that chat's next slot
+    schedule = []  # (next allowed send time, chat_id), one per pending chat
+    shards = [queue.SimpleQueue() for _ in range(SEND_WORKERS)]
+    for shard in shards:
+        Thread(target=run_send_worker, args=(shard,), daemon=True).start()
+    while True:
+        if schedule:
+            timeout = max(schedule[0][0] - time.monotonic(), 0)
+        else:
+            timeout = None
+        # Block only until the next chat slot opens, then take everything queued
+        try:
+            batch = [send_queue.get(timeout=timeout)]
+            while not send_queue.empty():
+                batch.append(send_queue.get_nowait())
+        except queue.Empty:
+            batch = []
+
+        now = time.monotonic()
+        for chat_id, method, args, kwargs in batch:
+            if chat_id not in pending:
+                pending[chat_id] = deque()
+                heapq.heappush(schedule, (now, chat_id))
+            pending[chat_id].append((method, args, kwargs))
+
+        if schedule and schedule[0][0] <= now:
+            _, chat_id = heapq.heappop(schedule)
+            calls = pending[chat_id]
+            if not calls:
+                # Idle for a full slot, so the chat needs no pacing state
+                del pending[chat_id]
+                continue
+            wait_for_slot(global_sends, GLOBAL_SEND_LIMIT)
+            global_sends.append(time.monotonic())
+            shards[hash(chat_id) % SEND_WORKERS].put(calls.popleft())
+            heapq.heappush(schedule, (time.monotonic() + 1 / CHAT_SEND_LIMIT, chat_id))
+
+# ============== COOLDOWNS ==============
+# Returns (0, first_time) and records the request when allowed,
+# else (seconds left to wait, False)
+def acquire_prediction_slot(user_id):
+    count, remaining, first_time = cooldown_script(
+        keys=[f"cooldown:{user_id}", ACTIVE_COOLDOWNS_KEY, f"seen:{user_id}"],
+        args=[COOLDOWN_SECONDS, MAX_PREDICTIONS, uuid.uuid4().hex, user_id, SEEN_USER_TTL]
+    )
+    if count < MAX_PREDICTIONS:
+        return 0, bool(first_time)
+    return max(int(remaining), 1), False
+
+def count_active_cooldowns():
+    secs, usecs = redis_client.time()
+    return redis_client.zcount(
+        ACTIVE_COOLDOWNS_KEY, secs + usecs / 1_000_000 - COOLDOWN_SECONDS, "+inf"
+    )
 
 # ============== PREDICTION ENGINE ==============
+# Values are drawn in batches so the request path only pops a ready pair
+prediction_pool = deque()
+prediction_pool_lock = Lock()
+prediction_rng = random.Random()  # seeded from os.urandom
+
+def refill_prediction_pool():
+    batch = []
+    for _ in range(PREDICTION_BATCH):
+        # Drawn in hundredths so no float rounding is needed
+        pred = prediction_rng.randrange(250, 451)
+        safe = prediction_rng.randrange(150, min(pred, 300) + 1)
+        batch.append((pred / 100, safe / 100))
+    prediction_pool.extend(batch)
+
+# Every prediction in the same minute shows the same HH:MM, so format it once
+# per minute. Both values come from one timestamp to stay consistent at the
+# minute boundary; a racing thread at worst formats the same string twice.
+prediction_time_cache = (None, "")
+
+def prediction_time():
+    global prediction_time_cache
+    target = time.time() + PREDICTION_DELAY
+    minute = int(target) // 60
+    cached_minute, text = prediction_time_cache
+    if cached_minute != minute:
+        text = format_time(datetime.fromtimestamp(target, INDIAN_TIMEZONE))
+        prediction_time_cache = (minute, text)
+    return text
+
 def generate_prediction():
-    pred = round(random.uniform(2.50, 4.50), 2)
-    safe = round(random.uniform(1.50, min(pred, 3.0)), 2)
-    future_time = get_indian_time() + timedelta(seconds=PREDICTION_DELAY)
-    return format_time(future_time), pred, safe
+    while True:
+        try:
+            pred, safe = prediction_pool.popleft()
+            break
+        except IndexError:
+            with prediction_pool_lock:
+                if not prediction_pool:
+                    refill_prediction_pool()
+    return prediction_time(), pred, safe
 
 # ============== TELEGRAM HANDLERS ==============
 @bot.message_handler(commands=['start', 'help'])
@@ -70,68 +414,37 @@ def send_welcome(message):
     try:
         user_id = message.chat.id
         
-        welcome_msg = (
-            f"{GRAPH} *ᗯEᒪᑕOᗰE TO ᗩI-ᑭOᗯEᖇEᗪ ᑭᖇEᗪIᑕTIOᑎ ᗷOT* {GRAPH}\n\n"
-            
-            "This bot generates high-probability predictions using "
-            "advanced algorithms. For optimal results:\n"
-            
-            f"{DIAMOND} Use suggested assurance for risk management\n"
-            f"{DIAMOND} Follow cooldown periods between predictions\n\n"
-            f"{SHIELD} *VIP Channel:* @{CHANNEL_USERNAME}"
-        )
-        
         if is_member(user_id):
-            markup = telebot.types.InlineKeyboardMarkup()
-            markup.add(
-                telebot.types.InlineKeyboardButton(
-                    f"{ROCKET} Generate Prediction {ROCKET}", 
-                    callback_data="get_prediction"
-                )
-            )
-            
-            bot.send_message(
-                user_id,
-                welcome_msg,
-                reply_markup=markup,
-                parse_mode="Markdown"
-            )
+            queue_message(user_id, WELCOME_MSG, reply_markup=WELCOME_MARKUP)
         else:
-            markup = telebot.types.InlineKeyboardMarkup()
-            markup.add(
-                telebot.types.InlineKeyboardButton(
-                    "Join VIP Channel", 
-                    url=f"https://t.me/{CHANNEL_USERNAME}"
-                ),
-                telebot.types.InlineKeyboardButton(
-                    "Verify Membership", 
-                    callback_data="check_membership"
-                )
-            )
-            
-            bot.send_message(
-                user_id,
-                f"{CROSS} *🅿🆁🅴🅼🅸🆄🅼 🅰🅲🅲🅴🆂🆂 🆁🅴🆀🆄🅸🆁🅴🅳*\n\n"
-                "\n You must join our VIP channel to access predictions:\n"
-                f"👉 @{CHANNEL_USERNAME}\n\n"
-                "After joining, click 'Verify Membership'",
-                reply_markup=markup,
-                parse_mode="Markdown"
-            )
-    except Exception as e:
-        print(f"Welcome error: {e}")
+            queue_message(user_id, JOIN_MSG, reply_markup=JOIN_MARKUP)
+    except Exception:
+        log.exception("Welcome error")
+
+@bot.chat_member_handler()
+def track_membership(update):
+    try:
+        if (update.chat.username or "").lower() != CHANNEL_USERNAME.lower():
+            return
+        cache_membership(
+            update.new_chat_member.user.id,
+            update.new_chat_member.status in MEMBER_STATUSES
+        )
+    except Exception:
+        log.exception("Membership update error")
 
 @bot.callback_query_handler(func=lambda call: call.data == "check_membership")
 def check_membership(call):
     try:
         user_id = call.message.chat.id
-        if is_member(user_id):
+        # The user says they just joined, so don't trust a cached "no"
+        if is_member(user_id, refresh=True):
             bot.answer_callback_query(call.id, "✅ Membership verified!")
             send_welcome(call.message)
         else:
             bot.answer_callback_query(call.id, "❌ Please join the channel first!", show_alert=True)
-    except Exception as e:
-        print(f"Membership check error: {e}")
+    except Exception:
+        log.exception("Membership check error")
 
 @bot.callback_query_handler(func=lambda call: call.data == "get_prediction")
 def handle_prediction(call):
@@ -142,8 +455,19 @@ def handle_prediction(call):
             bot.answer_callback_query(call.id, "❌ Channel membership required!", show_alert=True)
             return
             
-        if user_id in cooldowns and (remaining := cooldowns[user_id] - time.time()) > 0:
-            mins, secs = divmod(int(remaining), 60)
+        try:
+            remaining, first_time = acquire_prediction_slot(user_id)
+        except redis.RedisError as e:
+            log.warning("Cooldown store error: %s", e)
+            bot.answer_callback_query(
+                call.id,
+                f"{CROSS} Service unavailable, please try again later",
+                show_alert=True
+            )
+            return
+
+        if remaining > 0:
+            mins, secs = divmod(remaining, 60)
             bot.answer_callback_query(
                 call.id, 
                 f"{LOCK} Please wait {mins}m {secs}s", 
@@ -151,94 +475,145 @@ def handle_prediction(call):
             )
             return
 
-        # Remove button from original message
+        # Stop the button spinner before doing the rest of the work; a
+        # stale callback must not cost the user the prediction
         try:
-            bot.edit_message_reply_markup(
-                chat_id=call.message.chat.id,
-                message_id=call.message.message_id,
-                reply_markup=None
-            )
+            bot.answer_callback_query(call.id, "✅ Prediction generated!")
         except Exception as e:
-            print(f"Button removal error: {e}")
+            log.warning("Callback answer error: %s", e)
+
+        # Remove button from original message; queued under the same chat so
+        # the edit, sticker and prediction go out in order
+        queue_call(
+            user_id,
+            bot.edit_message_reply_markup,
+            chat_id=user_id,
+            message_id=call.message.message_id,
+            reply_markup=None
+        )
 
         # Send rocket sticker for first-time users
-        if user_id not in first_time_users:
-            try:
-                bot.send_sticker(user_id, ROCKET_STICKER_ID)
-                first_time_users.add(user_id)
-            except Exception as e:
-                print(f"Sticker sending error: {e}")
+        if first_time:
+            queue_call(user_id, bot.send_sticker, user_id, ROCKET_STICKER_ID)
 
         # Generate and send prediction
         future_time, pred, safe = generate_prediction()
         
-        prediction_msg = (
-            f"{ROCKET} *LUCKY JET PREDICTION*\n"
-            "┏━━━━━━━━━━━━━\n"
-            f"┠ {DIAMOND} 🕒 𝐓𝐈𝐌𝐄 : {future_time}\n"
-            f"┠\n"
-            f"┠ {DIAMOND} 𝐂𝐎𝐄𝐅𝐅𝐈𝐂𝐈𝐄𝐍𝐓 : {pred}X {ROCKET}\n"
-            f"┠\n"
-            f"┠ {DIAMOND} 𝐀𝐒𝐒𝐔𝐑𝐄𝐍𝐂𝐄 : {safe}X\n"
-            "┗━━━━━━━━━━━━━\n\n"
-            f"{HOURGLASS} Next prediction available in {COOLDOWN_SECONDS//60} minutes"
-        )
-        
-        # Create new button for next prediction
-        markup = telebot.types.InlineKeyboardMarkup()
-        markup.add(
-            telebot.types.InlineKeyboardButton(
-                f"{ROCKET} New Prediction {ROCKET}", 
-                callback_data="get_prediction"
-            )
-        )
+        prediction_msg = format_prediction(t=future_time, p=pred, s=safe)
         
-        bot.send_message(
-            user_id,
-            prediction_msg,
-            reply_markup=markup,
-            parse_mode="Markdown"
-        )
-        
-        # Set cooldown
-        cooldowns[user_id] = time.time() + COOLDOWN_SECONDS
-        bot.answer_callback_query(call.id, "✅ Prediction generated!")
+        queue_message(user_id, prediction_msg, reply_markup=PREDICTION_MARKUP)
             
-    except Exception as e:
-        print(f"Prediction error: {e}")
+    except Exception:
+        log.exception("Prediction error")
 
 # ============== FLASK SERVER ==============
+# Same C encoder telebot uses, for the JSON endpoints
+class UJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        return ujson.dumps(obj, ensure_ascii=False)
+
+    def loads(self, s, **kwargs):
+        return ujson.loads(s)
+
+app.json = UJSONProvider(app)
+
 @app.route('/')
 def health_check():
     return "🤖 Bot Operational", 200
 
 @app.route('/ping')
 def ping():
+    try:
+        users_in_cooldown = count_active_cooldowns()
+    except redis.RedisError as e:
+        log.warning("Cooldown store error: %s", e)
+        users_in_cooldown = None
     return {
         "status": "ok",
         "time": format_time(get_indian_time()),
-        "users_in_cooldown": len(cooldowns)
+        "users_in_cooldown": users_in_cooldown
     }
 
+# The token in the path keeps arbitrary POSTs from injecting fake updates
+@app.route('/webhook/<token>', methods=['POST'])
+def webhook(token):
+    # Bytes, since compare_digest raises on non-ASCII str
+    if not hmac.compare_digest(token.encode(), BOT_TOKEN.encode()):
+        abort(403)
+    update = telebot.types.Update.de_json(ujson.loads(request.stream.read()))
+    bot.process_new_updates([update])
+    return '', 200
+
 def run_flask():
-    if not is_port_in_use(PORT):
-        app.run(host='0.0.0.0', port=PORT, threaded=True)
+    try:
+        sock = bind_socket(PORT)
+    except OSError as e:
+        log.error("Cannot bind port %s: %s", PORT, e)
+        raise SystemExit(1)
+    serve(app, sockets=[sock], threads=WEB_THREADS, connection_limit=200)
 
 # ============== BOT POLLING ==============
 def run_bot():
-    print("🤖 Bot polling started")
+    log.info("🤖 Bot polling started")
+    backoff = 1
     while True:
+        started = time.monotonic()
+        # non_stop=False hands failures back here instead of retrying inside
+        # telebot: network errors raise, API errors stop polling and return
         try:
-            with bot_lock:
-                bot.infinity_polling(
-                    long_polling_timeout=30,
-                    timeout=20
-                )
+            bot.polling(
+                non_stop=False,
+                long_polling_timeout=50,
+                timeout=25,
+                allowed_updates=ALLOWED_UPDATES
+            )
+            error = "polling stopped"
         except Exception as e:
-            print(f"🛑 Bot crash: {e}")
-            time.sleep(10)
+            error = e
+        # A long healthy run means this is a fresh failure, not a retry storm
+        if time.monotonic() - started > 60:
+            backoff = 1
+        # Jittered exponential backoff so restarts don't retry in lockstep
+        delay = backoff + random.uniform(0, backoff / 2)
+        log.warning("🛑 Bot crash: %s (retrying in %.1fs)", error, delay)
+        time.sleep(delay)
+        backoff = min(backoff * 2, 60)
+
+# Only one process per host may poll; a second poller just gets 409 conflicts
+def acquire_polling_lock():
+    lock_file = open(POLLING_LOCK_PATH, 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock_file.close()
+        return None
+    return lock_file
+
+def set_webhook():
+    bot.remove_webhook()
+    time.sleep(0.5)
+    bot.set_webhook(
+        url=f"{WEBHOOK_URL}/webhook/{BOT_TOKEN}",
+        allowed_updates=ALLOWED_UPDATES
+    )
+    log.info("🔗 Webhook set to %s/webhook", WEBHOOK_URL)
+
+def warm_up_session():
+    try:
+        # Pays the TLS handshake before the first user callback
+        me = bot.get_me()
+        log.info("🤖 Connected as @%s", me.username)
+    except Exception as e:
+        log.warning("Warm-up error: %s", e)
 
 if __name__ == '__main__':
-    Thread(target=run_bot, daemon=True).start()
-    print(f"🌐 Starting web server on port {PORT}")
+    warm_up_session()
+    Thread(target=run_sender, daemon=True).start()
+    if WEBHOOK_URL:
+        set_webhook()
+    elif polling_lock := acquire_polling_lock():
+        Thread(target=run_bot, daemon=True).start()
+    else:
+        log.warning("Another process is already polling; serving web only")
+    log.info("🌐 Starting web server on port %s", PORT)
     run_flask()
@@ -0,0 +1,334 @@
+import os
+import queue
+import sys
+import threading
+import unittest
+from unittest import mock
+
+os.environ.setdefault("BOT_TOKEN", "123:test")
+os.environ.setdefault("CHANNEL_USERNAME", "testsub01")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+import pridict
+
+
+def drain_send_queue():
+    calls = []
+    while not pridict.send_queue.empty():
+        calls.append(pridict.send_queue.get_nowait())
+    return calls
+
+
+class HandlePredictionTest(unittest.TestCase):
+    def setUp(self):
+        drain_send_queue()
+        bot = mock.patch.object(pridict, "bot")
+        self.bot = bot.start()
+        self.addCleanup(bot.stop)
+        member = mock.patch.object(pridict, "is_member", return_value=True)
+        member.start()
+        self.addCleanup(member.stop)
+
+    def make_call(self):
+        call = mock.Mock()
+        call.id = "cb1"
+        call.message.chat.id = 42
+        call.message.message_id = 7
+        return call
+
+    def test_first_prediction_queues_edit_sticker_and_message(self):
+        with mock.patch.object(pridict, "acquire_prediction_slot", return_value=(0, True)):
+            pridict.handle_prediction(self.make_call())
+
+        self.bot.answer_callback_query.assert_called_once_with("cb1", "✅ Prediction generated!")
+        edit, sticker, message = drain_send_queue()
+        self.assertEqual(edit, (
+            42,
+            self.bot.edit_message_reply_markup,
+            (),
+            {"chat_id": 42, "message_id": 7, "reply_markup": None},
+        ))
+        self.assertEqual(sticker, (
+            42, self.bot.send_sticker, (42, pridict.ROCKET_STICKER_ID), {},
+        ))
+        chat_id, method, args, kwargs = message
+        self.assertEqual((chat_id, method), (42, self.bot.send_message))
+        self.assertEqual(args[0], 42)
+        self.assertIn("LUCKY JET PREDICTION", args[1])
+        self.assertEqual(kwargs, {"reply_markup": pridict.PREDICTION_MARKUP})
+
+    def test_repeat_prediction_skips_sticker(self):
+        with mock.patch.object(pridict, "acquire_prediction_slot", return_value=(0, False)):
+            pridict.handle_prediction(self.make_call())
+
+        methods = [method for _, method, _, _ in drain_send_queue()]
+        self.assertEqual(methods, [self.bot.edit_message_reply_markup, self.bot.send_message])
+
+    def test_cooldown_queues_nothing(self):
+        with mock.patch.object(pridict, "acquire_prediction_slot", return_value=(65, False)):
+            pridict.handle_prediction(self.make_call())
+
+        self.bot.answer_callback_query.assert_called_once_with(
+            "cb1", f"{pridict.LOCK} Please wait 1m 5s", show_alert=True
+        )
+        self.assertEqual(drain_send_queue(), [])
+
+
+class AcquirePredictionSlotTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(pridict, "cooldown_script")
+        self.script = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_allowed_first_time(self):
+        self.script.return_value = [0, 0, 1]
+        self.assertEqual(pridict.acquire_prediction_slot(42), (0, True))
+        kwargs = self.script.call_args.kwargs
+        self.assertEqual(
+            kwargs["keys"], ["cooldown:42", pridict.ACTIVE_COOLDOWNS_KEY, "seen:42"]
+        )
+        self.assertEqual(kwargs["args"][:2], [pridict.COOLDOWN_SECONDS, pridict.MAX_PREDICTIONS])
+        self.assertEqual(kwargs["args"][3:], [42, pridict.SEEN_USER_TTL])
+
+    def test_allowed_returning_user(self):
+        self.script.return_value = [0, 0, 0]
+        self.assertEqual(pridict.acquire_prediction_slot(42), (0, False))
+
+    def test_limited_returns_seconds_left(self):
+        self.script.return_value = [pridict.MAX_PREDICTIONS, 75, 0]
+        self.assertEqual(pridict.acquire_prediction_slot(42), (75, False))
+
+    def test_limited_waits_at_least_a_second(self):
+        self.script.return_value = [pridict.MAX_PREDICTIONS, 0, 0]
+        self.assertEqual(pridict.acquire_prediction_slot(42), (1, False))
+
+    def test_redis_errors_propagate(self):
+        self.script.side_effect = pridict.redis.ConnectionError
+        with self.assertRaises(pridict.redis.RedisError):
+            pridict.acquire_prediction_slot(42)
+
+
+class IsMemberTest(unittest.TestCase):
+    def setUp(self):
+        patchers = [
+            mock.patch.object(pridict, "bot"),
+            mock.patch.object(pridict, "redis_client"),
+            mock.patch.object(pridict, "local_member_cache", {}),
+        ]
+        self.bot, self.redis, self.local = [p.start() for p in patchers]
+        for p in patchers:
+            self.addCleanup(p.stop)
+
+    def test_local_hit_skips_redis_and_telegram(self):
+        self.local[42] = True
+        self.assertTrue(pridict.is_member(42))
+        self.redis.get.assert_not_called()
+        self.bot.get_chat_member.assert_not_called()
+
+    def test_redis_hit_skips_telegram(self):
+        self.redis.get.return_value = b"1"
+        self.assertTrue(pridict.is_member(42))
+        self.redis.get.assert_called_once_with("member:42")
+        self.bot.get_chat_member.assert_not_called()
+
+    def test_miss_asks_telegram_and_caches(self):
+        self.redis.get.return_value = None
+        self.bot.get_chat_member.return_value.status = "administrator"
+        self.assertTrue(pridict.is_member(42))
+        self.bot.get_chat_member.assert_called_once_with(f"@{pridict.CHANNEL_USERNAME}", 42)
+        self.redis.set.assert_called_once_with("member:42", "1", ex=pridict.MEMBER_CACHE_TTL)
+        self.assertIn(42, self.local)
+
+    def test_refresh_bypasses_both_caches(self):
+        self.local[42] = True
+        self.bot.get_chat_member.return_value.status = "member"
+        self.assertTrue(pridict.is_member(42, refresh=True))
+        self.redis.get.assert_not_called()
+        self.bot.get_chat_member.assert_called_once()
+
+    def test_redis_error_falls_back_to_telegram(self):
+        self.redis.get.side_effect = pridict.redis.ConnectionError
+        self.redis.set.side_effect = pridict.redis.ConnectionError
+        self.bot.get_chat_member.return_value.status = "member"
+        self.assertTrue(pridict.is_member(42))
+        self.assertIn(42, self.local)
+
+    def test_telegram_error_denies_without_caching(self):
+        self.redis.get.return_value = None
+        self.bot.get_chat_member.side_effect = Exception("timeout")
+        self.assertFalse(pridict.is_member(42))
+        self.redis.set.assert_not_called()
+
+    def test_non_member_is_not_cached_locally(self):
+        self.redis.get.return_value = b"0"
+        self.assertFalse(pridict.is_member(42))
+        self.assertNotIn(42, self.local)
+
+        # A join verified on another replica shows up on the next click
+        self.redis.get.return_value = b"1"
+        self.assertTrue(pridict.is_member(42))
+        self.assertIn(42, self.local)
+
+    def test_refresh_to_non_member_evicts_local_entry(self):
+        self.local[42] = True
+        self.bot.get_chat_member.return_value.status = "left"
+        self.assertFalse(pridict.is_member(42, refresh=True))
+        self.assertNotIn(42, self.local)
+        self.redis.set.assert_called_once_with(
+            "member:42", "0", ex=pridict.NON_MEMBER_CACHE_TTL
+        )
+
+
+class WebhookTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(pridict, "bot")
+        self.bot = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = pridict.app.test_client()
+
+    def test_wrong_token_is_forbidden(self):
+        for token in ("nope", "%C3%A9"):
+            response = self.client.post(f"/webhook/{token}", data="{}")
+            self.assertEqual(response.status_code, 403)
+        self.bot.process_new_updates.assert_not_called()
+
+    def test_valid_token_processes_update(self):
+        update = {"update_id": 1, "message": {
+            "message_id": 5, "date": 0, "text": "/start",
+            "chat": {"id": 42, "type": "private"},
+        }}
+        response = self.client.post(
+            f"/webhook/{pridict.BOT_TOKEN}", data=pridict.ujson.dumps(update)
+        )
+        self.assertEqual(response.status_code, 200)
+        (updates,), _ = self.bot.process_new_updates.call_args
+        self.assertEqual([u.update_id for u in updates], [1])
+        self.assertEqual(updates[0].message.text, "/start")
+
+
+class PingTest(unittest.TestCase):
+    def setUp(self):
+        self.client = pridict.app.test_client()
+
+    def test_reports_users_in_cooldown(self):
+        with mock.patch.object(pridict, "count_active_cooldowns", return_value=3):
+            body = self.client.get("/ping").get_json()
+        self.assertEqual((body["status"], body["users_in_cooldown"]), ("ok", 3))
+
+    def test_redis_outage_reports_null_count(self):
+        with mock.patch.object(
+            pridict, "count_active_cooldowns", side_effect=pridict.redis.ConnectionError
+        ):
+            response = self.client.get("/ping")
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.get_json()["users_in_cooldown"])
+
+
+class StopQueue(queue.Queue):
+    """Ends run_sender's loop once the sentinel is taken off the queue."""
+
+    STOP = object()
+
+    def get(self, *args, **kwargs):
+        item = super().get(*args, **kwargs)
+        if item is self.STOP:
+            raise SystemExit
+        return item
+
+
+class RunSenderTest(unittest.TestCase):
+    def run_sender(self, send_queue):
+        sender = threading.Thread(target=pridict.run_sender, daemon=True)
+        patcher = mock.patch.object(pridict, "send_queue", send_queue)
+        patcher.start()
+        sender.start()
+
+        def stop():
+            with mock.patch.object(threading, "excepthook"):
+                send_queue.put(StopQueue.STOP)
+                sender.join(1)
+            patcher.stop()
+            self.assertFalse(sender.is_alive())
+
+        self.addCleanup(stop)
+
+    def test_paced_or_slow_chat_does_not_block_other_chats(self):
+        sent = []
+        release = threading.Event()
+        other_chat_sent = threading.Event()
+
+        def slow_send(text):
+            release.wait(1)
+            sent.append(text)
+
+        def send(text):
+            sent.append(text)
+            if text == "b1":
+                other_chat_sent.set()
+
+        send_queue = StopQueue()
+        self.run_sender(send_queue)
+        send_queue.put((1, slow_send, ("a1",), {}))
+        send_queue.put((1, send, ("a2",), {}))
+        send_queue.put((2, send, ("b1",), {}))
+        self.assertTrue(other_chat_sent.wait(0.5))
+        self.assertEqual(sent, ["b1"])
+        release.set()
+
+    def test_calls_for_one_chat_keep_their_order(self):
+        sent = []
+        done = threading.Event()
+
+        def send(text):
+            sent.append(text)
+            if text == "c3":
+                done.set()
+
+        send_queue = StopQueue()
+        self.run_sender(send_queue)
+        with mock.patch.object(pridict, "CHAT_SEND_LIMIT", 100):
+            for text in ("c1", "c2", "c3"):
+                send_queue.put((3, send, (text,), {}))
+            self.assertTrue(done.wait(1))
+        self.assertEqual(sent, ["c1", "c2", "c3"])
+
+
+class RunBotTest(unittest.TestCase):
+    def test_polling_failures_back_off(self):
+        class Stop(Exception):
+            pass
+
+        delays = []
+
+        def sleep(delay):
+            delays.append(delay)
+            if len(delays) == 3:
+                raise Stop
+
+        with mock.patch.object(pridict, "bot") as bot, \
+                mock.patch.object(pridict.time, "sleep", side_effect=sleep):
+            bot.polling.side_effect = [ConnectionError, ConnectionError, None]
+            with self.assertRaises(Stop):
+                pridict.run_bot()
+
+        for delay, backoff in zip(delays, (1, 2, 4)):
+            self.assertTrue(backoff <= delay <= backoff * 1.5)
+        for c in bot.polling.call_args_list:
+            self.assertFalse(c.kwargs["non_stop"])
+            # Pending chat_member updates keep the membership cache honest
+            self.assertFalse(c.kwargs.get("skip_pending", False))
+
+
+class SetWebhookTest(unittest.TestCase):
+    def test_pending_updates_are_kept(self):
+        with mock.patch.object(pridict, "bot") as bot, \
+                mock.patch.object(pridict.time, "sleep"):
+            pridict.set_webhook()
+
+        bot.remove_webhook.assert_called_once_with()
+        self.assertFalse(bot.set_webhook.call_args.kwargs.get("drop_pending_updates", False))
+
+
+if __name__ == "__main__":
+    unittest.main()